@@ -1,35 +1,66 @@
 from typing import List, Dict, Optional, Tuple
 from backend.models import *
-import heapq
-from datetime import datetime
+import time
 
-# path finding with Dijkstra's algorithm
-def shortest_path(start: str, goal: str) -> tuple[float, list[str]]:
-    nodes = set(GRAPH.nodes)
-    if start not in nodes or goal not in nodes:
-        raise ValueError("start/goal must be valid graph nodes")
+# all-pairs shortest paths (Floyd-Warshall), filled once at import;
+# unreachable pairs are absent from both tables
+DIST: Dict[Tuple[str, str], float] = {}
+PATH: Dict[Tuple[str, str], Tuple[str, ...]] = {}
 
-    # construct adjacency list
-    adj = {}
-    for e in GRAPH.edges:
-        adj.setdefault(e.from_, []).append((e.to, e.weight))
-        adj.setdefault(e.to, []).append((e.from_, e.weight))  # bidirectional
+def _compute_apsp() -> None:
+    """
+    Fill DIST and PATH for every node pair of GRAPH.
+    The graph is tiny, so O(V^3) once beats a heap search per query.
+    """
+    # index the nodes so the O(V^3) loops run over list rows; edges touching unknown nodes are dropped
+    names = list(dict.fromkeys(GRAPH.nodes))
+    name2id = {name: i for i, name in enumerate(names)}
+    n = len(names)
+    inf = float("inf")
+    dist = [[inf] * n for _ in range(n)]
+    nxt = [[-1] * n for _ in range(n)]  # nxt[i][j] = first hop on the shortest i -> j path
+    for u, name in enumerate(names):
+        dist[u][u] = 0.0
+        nxt[u][u] = u
+        for nbr, w in ADJ.get(name, ()):
+            v = name2id.get(nbr)
+            if v is not None and w < dist[u][v]:
+                dist[u][v] = w
+                nxt[u][v] = v
+
+    for k in range(n):
+        dist_k = dist[k]
+        for i in range(n):
+            d_ik = dist[i][k]
+            if d_ik == inf:
+                continue
+            dist_i, nxt_i = dist[i], nxt[i]
+            for j in range(n):
+                if d_ik + dist_k[j] < dist_i[j]:
+                    dist_i[j] = d_ik + dist_k[j]
+                    nxt_i[j] = nxt_i[k]
 
-    heap = [(0.0, start, [start])]  # (distance, current_node, path)
-    visited = {}
+    # materialize every path once so queries are a single dict lookup
+    for i in range(n):
+        for j in range(n):
+            if nxt[i][j] == -1:
+                continue
+            path = [i]
+            while path[-1] != j:
+                path.append(nxt[path[-1]][j])
+            DIST[(names[i], names[j])] = dist[i][j]
+            PATH[(names[i], names[j])] = tuple(names[h] for h in path)
 
-    while heap:
-        dist, node, path = heapq.heappop(heap)
-        if node in visited:
-            continue
-        visited[node] = dist
-        if node == goal:
-            return dist, path
-        for nbr, w in adj.get(node, []):
-            if nbr not in visited:
-                heapq.heappush(heap, (dist + float(w), nbr, path + [nbr]))
+_compute_apsp()
 
-    raise ValueError(f"No path from {start} to {goal}")
+def shortest_path(start: str, goal: str) -> tuple[float, tuple[str, ...]]:
+    # returns the shared, immutable PATH entry; callers copy it only if they need a list
+    try:
+        return DIST[(start, goal)], PATH[(start, goal)]
+    except KeyError:
+        if start not in NODES_SET or goal not in NODES_SET:
+            raise ValueError("start/goal must be valid graph nodes") from None
+        raise ValueError(f"No path from {start} to {goal}") from None
 
 # robot assignment
 def assign_nearest_idle_robot(order: Order) -> Optional[Route]:
@@ -40,34 +71,24 @@ def assign_nearest_idle_robot(order: Order) -> Optional[Route]:
     - saves route for tick simulation
     """
     # Find all idle robots
-    idle_robots = [r for r in STATE["robots"] if r.status == RobotStatus.IDLE]
+    idle_robots = [r for r in STATE.robots.values() if r.status is RobotStatus.IDLE]
     if not idle_robots:
         # No idle robots available
         return None
 
-    best_robot = None
-    best_distance = float("inf")
-    path_to_source = None
-
-    for r in idle_robots:
-        try:
-            dist, best_path = shortest_path(r.node, order.source)
-        except ValueError:
-            continue  # No path to source
-        if dist < best_distance or (dist == best_distance and (best_robot is None or r.name < best_robot.name)):
-            best_robot = r
-            best_distance = dist
-            path_to_source = best_path
-
-    if best_robot is None:
+    # Nearest robot by precomputed distance, then by name; robots that can't reach the source are skipped
+    reachable = [r for r in idle_robots if (r.node, order.source) in DIST]
+    if not reachable:
         # No robot can reach the order's source node
         log_event("assignment_failed", {"order": order.name, "from": order.source, "to": order.target})
         return None
+    best_robot = min(reachable, key=lambda r: (DIST[(r.node, order.source)], r.name))
+    path_to_source = PATH[(best_robot.node, order.source)]
 
     # Path from source to target
     _, path_source_to_target = shortest_path(order.source, order.target)
     # Combine full path (avoiding duplicate source node)
-    full_path = path_to_source + path_source_to_target[1:]
+    full_path = [*path_to_source, *path_source_to_target[1:]]
 
     # Update statuses
     best_robot.status = RobotStatus.EXECUTING
@@ -75,10 +96,14 @@ def assign_nearest_idle_robot(order: Order) -> Optional[Route]:
 
     # Save route for tick simulation
     best_path = Route(robot=best_robot.name, next_index=0, path=full_path, order=order.name)
-    STATE["routes"].append(Route(robot=best_robot.name, next_index=0, path=full_path, order=order.name))
+    STATE.routes.append(Route(robot=best_robot.name, next_index=0, path=full_path, order=order.name))
     log_event("robot_assigned", {"robot": best_robot.name, "order": order.name, "path": full_path})
     return best_path
 
 # logger
 def log_event(type_: str, detail: dict):
-    STATE["events"].append(Event(time=datetime.utcnow().isoformat() + "Z", type=type_, detail=detail))
\ No newline at end of file
+    now_ns = time.time_ns()
+    STATE.events.append(Event(time_ns=now_ns, type=type_, detail=detail))
+    # parallel sorted key list (microseconds, the resolution of Event.time) so
+    # /events?since=... can bisect instead of parsing every event
+    STATE.events_epoch.append(now_ns // 1000)
\ No newline at end of file
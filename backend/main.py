@@ -1,7 +1,18 @@
-from typing import List, Dict, Optional
-from fastapi import FastAPI, HTTPException
+from typing import Annotated, Any, List, Dict, Optional, Tuple
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import HTMLResponse, FileResponse, ORJSONResponse, Response, StreamingResponse
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemLoader
+from markupsafe import Markup
+from datetime import datetime, timedelta, timezone
+import bisect
+import hashlib
+import itertools
+import os
+import uuid
+import orjson
 from backend.models import *
 from backend.helpers import *
 # -----------------------------
@@ -16,27 +27,68 @@ app = FastAPI(
         "Endpoints provided: /addOrder, /getOrders, /getGraph, /getRobots.\n"
         "State is in-memory and resets on restart."
     ),
+    # orjson encodes the response payloads in C instead of the stdlib json module
+    default_response_class=ORJSONResponse,
 )
 
-# CORS for local dev frontends (Vite/Next/CRA)
+# Jinja2 compiles each template once and reuses the bytecode (auto_reload off: no mtime checks);
+# autoescape keeps user-supplied names inert
+templates = Jinja2Templates(
+    env=Environment(
+        loader=FileSystemLoader(os.path.join(os.path.dirname(__file__), "templates")),
+        autoescape=True,
+        auto_reload=False,
+    )
+)
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# GRAPH doesn't change after startup: serialize it once, and hash the bytes for the ETag
+GRAPH_JSON: bytes = orjson.dumps(GRAPH.model_dump(by_alias=True))
+GRAPH_ETAG: str = f'"{hashlib.md5(GRAPH_JSON).hexdigest()}"'
+
+# Status -> icon / CSS class for the dashboard, shared by the template and its client-side redraw.
+# Built once here instead of a dict literal per rendered item.
+_ORDER_STATUS_ICON: Dict[OrderStatus, str] = {
+    OrderStatus.NEW: "🆕",
+    OrderStatus.IN_PROGRESS: "🔄",
+    OrderStatus.DONE: "✅",
+    OrderStatus.FAILED: "❌",
+}
+_ROBOT_STATUS_ICON: Dict[RobotStatus, str] = {RobotStatus.IDLE: "🟢", RobotStatus.EXECUTING: "🔴"}
+_ROBOT_STATUS_CLASS: Dict[RobotStatus, str] = {RobotStatus.IDLE: "idle", RobotStatus.EXECUTING: "executing"}
+templates.env.globals.update(
+    order_status_icons=_ORDER_STATUS_ICON,
+    robot_status_icons=_ROBOT_STATUS_ICON,
+    robot_status_classes=_ROBOT_STATUS_CLASS,
+)
+
+# Orders the scheduler (re)tries on every tick
+_ASSIGNABLE_ORDER_STATUSES = frozenset({OrderStatus.NEW, OrderStatus.FAILED})
+
+# Edges and nodes of the map are fixed, so their SVG is rendered once rather than per request
+STATIC_MAP_SVG = Markup(
+    templates.get_template("map_static.html").render(edges=GRAPH.edges, node_positions=NODE_POSITIONS)
+)
+
+# Distinguishes this process's state versions from a previous run's
+_BOOT_ID = uuid.uuid4().hex[:8]
+
+# CORS for local dev frontends (Vite/Next/CRA).
+# Exact origins are a set lookup per request; the API uses no cookies, so no credentials.
 app.add_middleware(
     CORSMiddleware,
     allow_origins=[
         "http://localhost:5173",  # Vite default
         "http://localhost:3000",  # CRA/Next.js
-        "*",  # loosen for exercise; tighten for prod
     ],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_credentials=False,
+    allow_methods=["GET", "POST"],
+    allow_headers=["content-type"],
 )
 
-# -----------------------------
-# Helpers
-# -----------------------------
-
-def _graph_nodes_set() -> set:
-    return set(GRAPH.nodes)
+# Compress text payloads (dashboard HTML, growing order/event lists); tiny bodies aren't worth it
+app.add_middleware(GZipMiddleware, minimum_size=1024)
 
 # -----------------------------
 # Lifecycle
@@ -45,8 +97,8 @@ def _graph_nodes_set() -> set:
 @app.on_event("startup")
 async def seed_state() -> None:
     # Seed only once per process start
-    STATE["orders"] = list(SEED_ORDERS)
-    STATE["robots"] = list(SEED_ROBOTS)
+    STATE.orders = {o.name: o for o in SEED_ORDERS}
+    STATE.robots = {r.name: r for r in SEED_ROBOTS}
 
 # -----------------------------
 # Endpoints (as specified)
@@ -61,11 +113,12 @@ async def favicon():
     return FileResponse(r"backend\static\favicon.ico")
 
 @app.get("/events", response_model=List[Event])
-async def get_events(limit: Optional[int] = None, since: Optional[str] = None):
+async def get_events(limit: Annotated[Optional[int], Query(ge=0)] = None, since: Optional[str] = None):
     """
     Retrieve events, optionally limited and filtered by a 'since' timestamp (ISO 8601).
     """
-    events = STATE.get("events", [])
+    events = STATE.events
+    start = 0
 
     if since is not None:
         try:
@@ -73,19 +126,17 @@ async def get_events(limit: Optional[int] = None, since: Optional[str] = None):
             since_dt = datetime.fromisoformat(since.replace("Z", "+00:00"))
         except ValueError:
             raise HTTPException(status_code=400, detail="Invalid ISO 8601 timestamp for 'since'")
-        
-        # Filter events, making event times UTC-aware
-        filtered_events = []
-        for e in events:
-            event_time = datetime.fromisoformat(e.time.replace("Z", "+00:00"))
-            if event_time > since_dt:
-                filtered_events.append(e)
-        events = filtered_events
+        if since_dt.tzinfo is None:
+            since_dt = since_dt.replace(tzinfo=timezone.utc)
 
-    if limit is not None:
-        events = events[-limit:]
+        # Events are appended in time order, so the first newer event is a binary search away
+        start = bisect.bisect_right(STATE.events_epoch, (since_dt - _EPOCH) // timedelta(microseconds=1))
 
-    return events[::-1]
+    if limit:
+        start = max(start, len(events) - limit)
+
+    # Newest first, copying only the selected events once
+    return list(itertools.islice(reversed(events), len(events) - start))
 
 @app.post("/addOrder", response_model=Order, tags=["orders"])
 async def add_order(req: AddOrderRequest) -> Order:
@@ -93,31 +144,40 @@ async def add_order(req: AddOrderRequest) -> Order:
     Add a new order to the system.
     """
     # Validate nodes exist in graph
-    nodes = _graph_nodes_set()
-    if req.source not in nodes or req.target not in nodes:
+    if req.source not in NODES_SET or req.target not in NODES_SET:
         raise HTTPException(status_code=400, detail="source/target must be valid graph nodes")
 
     # Enforce unique order name for simplicity
-    if any(o.name == req.name for o in STATE["orders"]):
+    if req.name in STATE.orders:
         raise HTTPException(status_code=409, detail="Order with this name already exists")
 
     order = Order(name=req.name, source=req.source, target=req.target, status=OrderStatus.NEW)
-    STATE["orders"].append(order)
+    STATE.orders[order.name] = order
     assign_nearest_idle_robot(order)
     log_event("order_created", {"order": order.name, "source": order.source, "target": order.target})
+    STATE.version += 1
     return order
 
 @app.get("/getOrders", response_model=OrdersResponse, tags=["orders"])
 async def get_orders() -> OrdersResponse:
-    return OrdersResponse(orders=STATE["orders"])
+    return OrdersResponse(orders=list(STATE.orders.values()))
 
 @app.get("/getRobots", response_model=RobotsResponse, tags=["robots"])
 async def get_robots() -> RobotsResponse:
-    return RobotsResponse(robots=STATE["robots"])
+    return RobotsResponse(robots=[Robot(name=r.name, status=r.status, node=r.node) for r in STATE.robots.values()])
 
 @app.get("/getGraph", response_model=Graph, tags=["graph"])
-async def get_graph() -> Graph:
-    return GRAPH
+async def get_graph(request: Request) -> Response:
+    """
+    Serve the pre-serialized graph; clients revalidate with If-None-Match and get 304 when unchanged.
+    """
+    if request.headers.get("if-none-match") == GRAPH_ETAG:
+        return Response(status_code=304, headers={"ETag": GRAPH_ETAG})
+    return Response(
+        GRAPH_JSON,
+        media_type="application/json",
+        headers={"ETag": GRAPH_ETAG, "Cache-Control": "public, max-age=3600"},
+    )
 
 # -----------------------------
 # Optional: additional stubs to support simulation (Frontend can ignore)
@@ -126,7 +186,7 @@ async def get_graph() -> Graph:
 # NOTE: These are *stubs* for stretch goals; they currently return empty data.
 @app.get("/routes", response_model=RoutesResponse, tags=["simulation"])
 async def get_routes() -> RoutesResponse:
-    return RoutesResponse(routes=STATE.get("routes", []))
+    return RoutesResponse(routes=STATE.routes)
 
 @app.post("/tick", tags=["simulation"])
 async def tick() -> Dict[str, str]:
@@ -135,18 +195,18 @@ async def tick() -> Dict[str, str]:
     - Move robots along their routes
     - Assign new/failed orders if possible
     """
-    for route in STATE.get("routes", []):
-        robot = next(r for r in STATE["robots"] if r.name == route.robot)
+    # Routes still running after this tick; rebuilt once instead of removing while iterating
+    active_routes: List[Route] = []
+    for route in STATE.routes:
+        robot = STATE.robots[route.robot]
         
         # If starting a new edge, initialize remaining_weight
         if route.remaining_weight == 0 and route.next_index < len(route.path) - 1:
             # Find edge weight
             from_node = route.path[route.next_index]
             to_node = route.path[route.next_index + 1]
-            edge = next((e for e in GRAPH.edges if 
-                         (e.from_ == from_node and e.to == to_node) or 
-                         (e.from_ == to_node and e.to == from_node)), None)
-            route.remaining_weight = edge.weight if edge else 1
+            route.current_edge_weight = EDGE_W.get((from_node, to_node), 1)
+            route.remaining_weight = route.current_edge_weight
 
         # Advance robot along the edge
         if route.remaining_weight > 0:
@@ -162,54 +222,56 @@ async def tick() -> Dict[str, str]:
         # Route completed
         if route.next_index == len(route.path) - 1:
             robot.status = RobotStatus.IDLE
-            order = next(o for o in STATE["orders"] if o.name == route.order)
+            order = STATE.orders[route.order]
             order.status = OrderStatus.DONE
-            STATE["routes"].remove(route)
             log_event("order_completed", {"order": order.name, "robot": robot.name, "at": robot.node})
+        else:
+            active_routes.append(route)
+    STATE.routes = active_routes
 
     # Assign NEW or FAILED orders
-    for order in STATE["orders"]:
-        if order.status in {OrderStatus.NEW, OrderStatus.FAILED}:
+    for order in STATE.orders.values():
+        if order.status in _ASSIGNABLE_ORDER_STATUSES:
             assign_nearest_idle_robot(order)
     log_event("tick_processed", {})
+    STATE.version += 1
     return {"status": "ok"}
 
 
-@app.get("/dashboard", response_class=HTMLResponse)
-async def dashboard() -> str:
+# (STATE.version, page) of the last fully rendered dashboard; replaced in one assignment
+# because the render finishes in a threadpool worker while handlers read it on the loop
+_DASHBOARD_CACHE: Optional[Tuple[int, bytes]] = None
+
+def _state_etag() -> str:
+    # STATE.version is per process; the boot id keeps ETags from matching across restarts
+    return f'"{_BOOT_ID}-{STATE.version}"'
+
+def _dashboard_view() -> Dict[str, Any]:
     """
-    Display real-time AGV fleet dashboard with robots and orders status.
-    
+    Derive everything the dashboard draws from STATE.
+
     Returns:
-        HTML page showing current robot states and order progress
+        dict with robot marker positions (at a node, or part-way along an edge)
+        and the robots/orders/routes lists, all JSON-serializable; robot/order
+        names appear only pre-escaped (html_name), which is all the renderers use
     """
-    robots = STATE["robots"]
-    orders = STATE["orders"]
-    routes = STATE["routes"]
-    
-    # Create a mapping of node -> list of robots at that node
-    node_robots: Dict[str, List[str]] = {}
-    for node in GRAPH.nodes:
-        node_robots[node] = []
-    
-    for robot in robots:
-        if robot.node in node_robots:
-            node_robots[robot.node].append(robot.name)
+    robots = STATE.robots.values()
+    orders = STATE.orders.values()
+    routes = STATE.routes
 
     # Compute in-flight robot positions (robots currently traversing an edge)
     in_flight_positions: Dict[str, tuple[float, float]] = {}
     for route in routes:
         # route.next_index points at the current node index; if next_index < len(path)-1
         # the robot is traversing from path[next_index] -> path[next_index+1]
-        if getattr(route, "remaining_weight", 0) > 0 and route.next_index < len(route.path) - 1:
+        if route.remaining_weight > 0 and route.next_index < len(route.path) - 1:
             from_node = route.path[route.next_index]
             to_node = route.path[route.next_index + 1]
             if from_node in NODE_POSITIONS and to_node in NODE_POSITIONS:
                 x1, y1 = NODE_POSITIONS[from_node]
                 x2, y2 = NODE_POSITIONS[to_node]
-                # find edge weight
-                edge = next((e for e in GRAPH.edges if (e.from_ == from_node and e.to == to_node) or (e.from_ == to_node and e.to == from_node)), None)
-                edge_w = float(edge.weight) if edge else 1.0
+                # weight recorded by tick() when the edge was started
+                edge_w = route.current_edge_weight or EDGE_W.get((from_node, to_node), 1.0)
                 # compute fraction progressed along edge
                 progressed = max(0.0, min(edge_w - float(route.remaining_weight), edge_w))
                 frac = progressed / edge_w if edge_w != 0 else 1.0
@@ -217,159 +279,110 @@ async def dashboard() -> str:
                 ry = y1 + (y2 - y1) * frac
                 in_flight_positions[route.robot] = (rx, ry)
 
-    # Remove in-flight robots from node lists so they aren't double-drawn at the node
-    for robot_name in list(in_flight_positions.keys()):
-        for node_list in node_robots.values():
-            if robot_name in node_list:
-                node_list.remove(robot_name)
-    
-    html = """
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <title>AGV Fleet Dashboard</title>
-        <style>
-            .dashboard { font-family: Arial, sans-serif; margin: 20px; }
-            .container { display: flex; gap: 30px; margin-bottom: 30px; }
-            .map-section { flex: 1; }
-            .status-section { flex: 1; }
-            .svg-map { border: 1px solid #ccc; background: #f9f9f9; }
-            .node { fill: #4CAF50; stroke: #2E7D32; stroke-width: 2; }
-            .node-text { font-size: 14px; font-weight: bold; fill: white; text-anchor: middle; }
-            .edge { stroke: #666; stroke-width: 2; }
-            .edge-text { font-size: 12px; fill: #333; }
-            .robot { fill: #FF5722; stroke: #D84315; stroke-width: 2; }
-            .robot-text { font-size: 10px; fill: white; text-anchor: middle; }
-            ul { list-style-type: none; padding: 0; }
-            li { margin: 8px 0; padding: 8px; background: #f5f5f5; border-radius: 4px; }
-            .idle { color: #4CAF50; }
-            .executing { color: #FF5722; }
-        </style>
-    </head>
-    <body>
-        <div class="dashboard">
-            <h1>🚀 AGV Fleet Dashboard</h1>
-            <div class="container">
-                <div class="map-section">
-                    <h2>Map Visualization</h2>
-    """
-    
-    # SVG Map
-    svg_width = 400
-    svg_height = 300
-    html += f'<svg width="{svg_width}" height="{svg_height}" class="svg-map">'
-    
-    # Draw edges first (so they appear behind nodes)
-    for edge in GRAPH.edges:
-        if edge.from_ in list(NODE_POSITIONS.keys()) and edge.to in list(NODE_POSITIONS.keys()):
-            x1, y1 = NODE_POSITIONS[edge.from_]
-            x2, y2 = NODE_POSITIONS[edge.to]
-            html += f'<line x1="{x1}" y1="{y1}" x2="{x2}" y2="{y2}" class="edge" />'
-            # Edge label (weight)
-            mid_x = (x1 + x2) / 2
-            mid_y = (y1 + y2) / 2
-            html += f'<text x="{mid_x}" y="{mid_y - 5}" class="edge-text">{edge.weight}</text>'
-    
-    # Draw nodes
+    # Map node -> robots parked there, in one pass; in-flight robots are drawn on their edge instead
+    node_robots: Dict[str, List[Markup]] = {node: [] for node in GRAPH.nodes}
+    for robot in robots:
+        if robot.node in node_robots and robot.name not in in_flight_positions:
+            node_robots[robot.node].append(robot.html_name)
+
+    # Robots parked at a node sit in a row above it; in-flight robots sit on their edge
+    robot_markers = []
     for node, (x, y) in NODE_POSITIONS.items():
-        # Node circle
-        html += f'<circle cx="{x}" cy="{y}" r="20" class="node" />'
-        # Node label
-        html += f'<text x="{x}" y="{y + 5}" class="node-text">{node}</text>'
-        
-        # Draw robots at this node
-        robots_here = node_robots[node]
-        for i, robot_name in enumerate(robots_here):
-            # If this robot is currently in-flight along an edge, skip drawing it at the node
-            if robot_name in in_flight_positions:
-                continue
-            robot_x = x - 15 + (i * 15)
-            robot_y = y - 30
-            html += f'<circle cx="{robot_x}" cy="{robot_y}" r="8" class="robot" />'
-            html += f'<text x="{robot_x}" y="{robot_y + 3}" class="robot-text">{robot_name}</text>'
-    
-    # Draw in-flight robots (between nodes) inside the same SVG
+        for i, html_name in enumerate(node_robots[node]):
+            robot_markers.append({"html_name": html_name, "x": x - 15 + (i * 15), "y": y - 30})
     for robot_name, (rx, ry) in in_flight_positions.items():
-        html += f'<circle cx="{rx}" cy="{ry}" r="8" class="robot" />'
-        html += f'<text x="{rx}" y="{ry + 3}" class="robot-text">{robot_name}</text>'
-
-    html += '</svg>'
-    
-    # Status sections
-    html += """
-                </div>
-                <div class="status-section">
-                    <h2>Robots Status</h2>
-                    <ul>
+        robot_markers.append({"html_name": STATE.robots[robot_name].html_name, "x": rx, "y": ry})
+
+    return {
+        "version": STATE.version,
+        "robot_markers": robot_markers,
+        "robots": [
+            {"html_name": r.html_name, "status": r.status.value, "node": r.node}
+            for r in robots
+        ],
+        "orders": [
+            {"html_name": o.html_name, "source": o.source, "target": o.target, "status": o.status.value}
+            for o in orders
+        ],
+        "routes": [
+            {
+                "robot_html_name": STATE.robots[route.robot].html_name,
+                "order_html_name": STATE.orders[route.order].html_name,
+                "remaining_path": route.path[route.next_index:],
+            }
+            for route in routes
+        ],
+    }
+
+@app.get("/dashboard", response_class=HTMLResponse)
+async def dashboard() -> Response:
     """
-    
-    for r in robots:
-        status_class = "idle" if r.status == RobotStatus.IDLE else "executing"
-        status_icon = "🟢" if r.status == RobotStatus.IDLE else "🔴"
-        html += f'<li class="{status_class}">{status_icon} <strong>{r.name}</strong> — {r.status.value} at <strong>{r.node}</strong></li>'
-    
-    html += """
-                    </ul>
-                    
-                    <h2>Orders</h2>
-                    <ul>
+    Display real-time AGV fleet dashboard with robots and orders status.
+    The page renders the current state once, then polls /dashboardState for changes.
+
+    Returns:
+        HTML page showing current robot states and order progress, streamed as it renders
     """
-    
-    for o in orders:
-        # icons
-        status_icon = {
-            OrderStatus.NEW: "🆕",
-            OrderStatus.IN_PROGRESS: "🔄", 
-            OrderStatus.DONE: "✅",
-            OrderStatus.FAILED: "❌"
-        }.get(o.status, "❓")
-
-        html += f'<li>{status_icon} <strong>{o.name}</strong>: {o.source} → {o.target} [{o.status.value}]</li>'
-    
-    # Route section
-    html += """
-            </ul>
-            </div>
-            <div class="status-section">
-                <h2>Routes</h2>
-                <ul>
+    # The page is a pure function of the state version: re-render only after a mutation
+    cached = _DASHBOARD_CACHE
+    if cached is not None and cached[0] == STATE.version:
+        return HTMLResponse(cached[1])
+
+    # Snapshot STATE on the event loop (handlers mutating it run here too); the template
+    # then renders from the snapshot in the threadpool, where StreamingResponse iterates
+    # sync generators, so the string building doesn't block other requests
+    view = _dashboard_view()
+    context = {
+        "svg_width": 400,
+        "svg_height": 300,
+        "static_map": STATIC_MAP_SVG,
+        "etag": f'"{_BOOT_ID}-{view["version"]}"',
+        **view,
+    }
+
+    def render_chunks():
+        global _DASHBOARD_CACHE
+        stream = templates.get_template("dashboard.html").stream(context)
+        # group Jinja's per-node output into fewer, larger chunks
+        stream.enable_buffering(64)
+        chunks = []
+        for chunk in stream:
+            data = chunk.encode("utf-8")
+            chunks.append(data)
+            yield data
+        # only a fully sent page is cached; a client disconnect stops the generator early
+        _DASHBOARD_CACHE = (view["version"], b"".join(chunks))
+
+    return StreamingResponse(render_chunks(), media_type="text/html")
+
+@app.get("/dashboardState")
+async def dashboard_state(request: Request) -> Response:
     """
-
-    for route in routes:
-        remaining_path = route.path[route.next_index:]
-        html += f'<li><strong>{route.robot}</strong> → Order: <strong>{route.order}</strong> | Remaining path: {" → ".join(remaining_path)}</li>'
-
-
-    html += """
-                </ul>
-            </div>
+    Dynamic part of the dashboard as JSON.
+    Answers 304 Not Modified when the client's If-None-Match matches the current state version.
     """
+    etag = _state_etag()
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return ORJSONResponse(_dashboard_view(), headers={"ETag": etag})
 
-    # add auto-refresh script
-    html += """
-    <script>
-    // Reload the entire dashboard every 2 seconds
-    setInterval(() => {
-        window.location.reload();
-    }, 2000);
-    </script>
-    """
-    html += "</div></body></html>"
-    
-    return html
 # -----------------------------
 # Run (if executed directly)
 # -----------------------------
 
-# Use: uvicorn main:app --reload // or python -m uvicorn main:app --reload
+# Use: python -m backend.main // or uvicorn backend.main:app (add --reload while developing)
 if __name__ == "__main__":
+    import sys
     import uvicorn
 
     uvicorn.run(
-        "main:app",
+        "backend.main:app",
         host="0.0.0.0",
         port=8000,
-        reload=True,
+        # C event loop and HTTP parser; uvloop has no Windows build
+        loop="asyncio" if sys.platform == "win32" else "uvloop",
+        http="httptools",
+        # STATE lives in process memory, so keep a single worker
+        workers=1,
+        reload=os.environ.get("UVICORN_RELOAD", "").lower() in ("1", "true"),
     )
-
-
@@ -1,7 +1,11 @@
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional, Tuple
+from dataclasses import dataclass, field
 from enum import Enum
+import functools
+import time
 
-from pydantic import BaseModel, Field
+from markupsafe import Markup
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, computed_field
 
 # -----------------------------
 # Domain Models (Pydantic)
@@ -22,20 +26,40 @@ class Robot(BaseModel):
     status: RobotStatus
     node: str
 
+@dataclass(slots=True)
+class RobotState:
+    """Robot as held in STATE; validated/serialized as Robot only at the API boundary."""
+    name: str
+    status: RobotStatus
+    node: str
+    # Markup passes through Jinja autoescape untouched, so the name is escaped once here, not per render
+    html_name: Markup = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self) -> None:
+        self.html_name = Markup.escape(self.name)
+
 class Order(BaseModel):
     name: str
     source: str # from node
     target: str # to node
     status: OrderStatus = OrderStatus.NEW
+    # private so it stays out of the API schema and model_dump; html_name exposes it read-only
+    _html_name: Markup = PrivateAttr()
+
+    def model_post_init(self, context: Any) -> None:
+        self._html_name = Markup.escape(self.name)
+
+    @property
+    def html_name(self) -> Markup:
+        return self._html_name
 
 class Edge(BaseModel):
     from_: str = Field(alias="from")
     to: str
     weight: float = 1.0 # how much ticks to traverse
 
-    class Config:
-        allow_population_by_field_name = True
-        json_encoders = {RobotStatus: lambda s: s.value, OrderStatus: lambda s: s.value}
+    # edges are graph constants: frozen makes them immutable and hashable
+    model_config = ConfigDict(populate_by_name=True, frozen=True)
 
 class Graph(BaseModel):
     nodes: List[str]
@@ -47,15 +71,28 @@ class Route(BaseModel):
     order: str
     path: List[str]  # sequence of node names
     remaining_weight: float = 0  # ticks left to finish current edge
+    current_edge_weight: float = 0  # full weight of current edge, set when it is started
 
 class RoutesResponse(BaseModel):
     routes: List[Route]
 
+@functools.lru_cache(maxsize=1024)
+def _iso_second(seconds: int) -> str:
+    # events come in bursts within the same second, so the date/time prefix is shared
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds))
+
 class Event(BaseModel):
-    time: str
+    time_ns: int = Field(exclude=True)  # UTC epoch nanoseconds, stored raw; formatted on serialization
     type: str
     detail: dict
 
+    @computed_field
+    @property
+    def time(self) -> str:
+        """ISO 8601 UTC timestamp with microseconds, e.g. 2025-01-01T12:00:00.123456Z"""
+        seconds, ns = divmod(self.time_ns, 1_000_000_000)
+        return f"{_iso_second(seconds)}.{ns // 1000:06d}Z"
+
 # -----------------------------
 # API Schemas
 # -----------------------------
@@ -76,12 +113,18 @@ class RobotsResponse(BaseModel):
 # In-memory State (Replace with DB for prod)
 # -----------------------------
 
-STATE: Dict[str, List] = {
-    "orders": [],
-    "robots": [],
-    "routes": [],
-    "events": [],
-}
+@dataclass(slots=True)
+class AppState:
+    # orders/robots keyed by name; dicts keep insertion order for the list endpoints
+    orders: Dict[str, Order] = field(default_factory=dict)
+    robots: Dict[str, RobotState] = field(default_factory=dict)
+    routes: List[Route] = field(default_factory=list)
+    events: List[Event] = field(default_factory=list)
+    events_epoch: List[int] = field(default_factory=list)  # UTC epoch microseconds of each event, same order as events
+    # bumped by every state-changing endpoint; drives dashboard ETags
+    version: int = 0
+
+STATE = AppState()
 
 GRAPH: Graph = Graph(
     nodes=["A", "B", "C", "D", "E", "F"],
@@ -96,6 +139,26 @@ GRAPH: Graph = Graph(
     ],
 )
 
+# GRAPH is fixed for the life of the process: everything derived from it (these lookups,
+# the path tables in helpers, the pre-serialized /getGraph body and map SVG) is built once at import
+
+# Node membership checks (request validation) without rebuilding a set per call
+NODES_SET: frozenset = frozenset(GRAPH.nodes)
+
+# Edge weight lookup, stored for both directions: EDGE_W[(u, v)] == EDGE_W[(v, u)]
+EDGE_W: Dict[Tuple[str, str], float] = {
+    pair: float(e.weight) for e in GRAPH.edges for pair in ((e.from_, e.to), (e.to, e.from_))
+}
+
+def _adjacency(nodes: List[str], edge_w: Dict[Tuple[str, str], float]) -> Dict[str, Tuple[Tuple[str, float], ...]]:
+    adj: Dict[str, List[Tuple[str, float]]] = {node: [] for node in nodes}
+    for (u, v), w in edge_w.items():
+        adj.setdefault(u, []).append((v, w))
+    return {node: tuple(nbrs) for node, nbrs in adj.items()}
+
+# Undirected adjacency list: node -> ((neighbour, weight), ...), built once from EDGE_W
+ADJ: Dict[str, Tuple[Tuple[str, float], ...]] = _adjacency(GRAPH.nodes, EDGE_W)
+
 # Manual example positions for nodes (for frontend visualization)
 NODE_POSITIONS = {
     "A": (50, 50),
@@ -108,9 +171,9 @@ NODE_POSITIONS = {
 
 # Seed data for testing
 SEED_ROBOTS = [
-    Robot(name="R1", status=RobotStatus.IDLE, node="A"),
-    Robot(name="R2", status=RobotStatus.EXECUTING, node="C"),
-    Robot(name="R3", status=RobotStatus.IDLE, node="E"),
+    RobotState(name="R1", status=RobotStatus.IDLE, node="A"),
+    RobotState(name="R2", status=RobotStatus.EXECUTING, node="C"),
+    RobotState(name="R3", status=RobotStatus.IDLE, node="E"),
 ]
 
 # Seed orders for testing
@@ -9,20 +9,61 @@ from backend.helpers import shortest_path, assign_nearest_idle_robot, STATE, GRA
 @pytest.fixture(autouse=True)
 def reset_state():
     """Reset STATE and robots before each test."""
-    STATE["orders"] = []
-    STATE["robots"] = [
-        Robot(name="R1", status=RobotStatus.IDLE, node="A"),
-        Robot(name="R2", status=RobotStatus.IDLE, node="C"),
-        Robot(name="R3", status=RobotStatus.IDLE, node="E"),
-    ]
-    STATE["routes"] = []
-    STATE["events"] = []
+    from backend import main
+
+    STATE.orders = {}
+    STATE.robots = {
+        "R1": RobotState(name="R1", status=RobotStatus.IDLE, node="A"),
+        "R2": RobotState(name="R2", status=RobotStatus.IDLE, node="C"),
+        "R3": RobotState(name="R3", status=RobotStatus.IDLE, node="E"),
+    }
+    STATE.routes = []
+    STATE.events = []
+    STATE.events_epoch = []
+    STATE.version = 0
+    main._DASHBOARD_CACHE = None  # a page cached by an earlier test would match version 0
     yield
     # cleanup if needed
-    STATE["orders"] = []
-    STATE["robots"] = []
-    STATE["routes"] = []
-    STATE["events"] = []
+    STATE.orders = {}
+    STATE.robots = {}
+    STATE.routes = []
+    STATE.events = []
+    STATE.events_epoch = []
+
+def asgi_get(path: str, query_string: bytes = b"", headers: Optional[Dict[str, str]] = None):
+    """Send one GET through the full app (middleware included); returns (status, headers, body)."""
+    from backend.main import app
+    import asyncio
+
+    scope = {
+        "type": "http",
+        "method": "GET",
+        "path": path,
+        "query_string": query_string,
+        "headers": [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()],
+    }
+    sent = []
+
+    async def run():
+        done = asyncio.Event()
+        requested = False
+        async def receive():
+            nonlocal requested
+            if not requested:
+                requested = True
+                return {"type": "http.request", "body": b"", "more_body": False}
+            # streaming responses listen for a disconnect; report it once the body is sent
+            await done.wait()
+            return {"type": "http.disconnect"}
+        async def send(message):
+            sent.append(message)
+            if message["type"] == "http.response.body" and not message.get("more_body"):
+                done.set()
+        await app(scope, receive, send)
+
+    asyncio.run(run())
+    response_headers = {k.decode(): v.decode() for k, v in sent[0]["headers"]}
+    return sent[0]["status"], response_headers, b"".join(m.get("body", b"") for m in sent[1:])
 
 # -----------------------------
 # Pathfinding Tests
@@ -45,9 +86,8 @@ def test_shortest_path_monotonicity():
                 dist, path = shortest_path(start, end)
                 total = 0
                 for i in range(len(path)-1):
-                    # find edge weight
-                    edge = next(e for e in GRAPH.edges if (e.from_ == path[i] and e.to == path[i+1]) or (e.from_ == path[i+1] and e.to == path[i]))
-                    total += edge.weight
+                    # edge weight, O(1) in either direction
+                    total += EDGE_W[(path[i], path[i+1])]
                     # cumulative distance should never exceed total
                     assert total <= dist
                 # final total should equal dist
@@ -57,6 +97,20 @@ def test_shortest_path_invalid_node():
     with pytest.raises(ValueError):
         shortest_path("X", "A")
 
+def test_get_graph_etag():
+    import orjson
+
+    status, headers, body = asgi_get("/getGraph")
+    assert status == 200
+    assert orjson.loads(body) == GRAPH.model_dump(by_alias=True)
+    assert headers["cache-control"] == "public, max-age=3600"
+    etag = headers["etag"]
+
+    status, headers, body = asgi_get("/getGraph", headers={"If-None-Match": etag})
+    assert status == 304
+    assert body == b""
+    assert headers["etag"] == etag
+
 # -----------------------------
 # Scheduling / Assignment Tests
 # -----------------------------
@@ -68,28 +122,116 @@ def test_assign_nearest_idle_robot():
     # A robot should be assigned
     assert route is not None
     assert order.status == OrderStatus.IN_PROGRESS
-    robot = next(r for r in STATE["robots"] if r.name == route.robot)
+    robot = STATE.robots[route.robot]
     assert robot.status == RobotStatus.EXECUTING
 
 def test_assign_nearest_idle_robot_tiebreak():
     """Tie-break by robot name if distances equal"""
     # Place R1 and R2 at same distance to B
-    STATE["robots"][0].node = "A"  # R1
-    STATE["robots"][1].node = "C"  # R2
+    STATE.robots["R1"].node = "A"  # R1
+    STATE.robots["R2"].node = "C"  # R2
     order = Order(name="O2", source="B", target="D")
     route = assign_nearest_idle_robot(order)
     # R1 should be chosen because name is lexicographically smaller
     assert route.robot == "R1"
 
+def test_assign_nearest_idle_robot_equal_distance_tiebreak():
+    """C and F are both 2 away from D; the smaller robot name wins"""
+    STATE.robots["R1"].status = RobotStatus.EXECUTING  # R1
+    STATE.robots["R2"].node = "F"  # R2
+    STATE.robots["R3"].node = "C"  # R3
+    order = Order(name="O6", source="D", target="A")
+    route = assign_nearest_idle_robot(order)
+    assert route.robot == "R2"
+    assert route.path[:2] == ["F", "D"]
+
 def test_assign_nearest_idle_robot_no_idle():
     # Make all robots busy
-    for r in STATE["robots"]:
+    for r in STATE.robots.values():
         r.status = RobotStatus.EXECUTING
     order = Order(name="O3", source="B", target="D")
     route = assign_nearest_idle_robot(order)
     assert route is None
     assert order.status == OrderStatus.NEW
 
+def test_add_order_duplicate_name():
+    from backend.main import add_order
+    from fastapi import HTTPException
+    import asyncio
+
+    asyncio.run(add_order(AddOrderRequest(name="O7", source="B", target="D")))
+    assert list(STATE.orders) == ["O7"]
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(add_order(AddOrderRequest(name="O7", source="A", target="F")))
+    assert exc.value.status_code == 409
+    assert len(STATE.orders) == 1
+
+def test_dashboard_escapes_order_names():
+    from backend.main import add_order, dashboard_state
+    import asyncio
+    import orjson
+    from starlette.requests import Request
+
+    asyncio.run(add_order(AddOrderRequest(name="<b>O8</b>", source="B", target="D")))
+    assert STATE.orders["<b>O8</b>"].html_name == "&lt;b&gt;O8&lt;/b&gt;"
+    response = asyncio.run(dashboard_state(Request({"type": "http", "headers": []})))
+    state = orjson.loads(response.body)
+    assert state["orders"][0] == {"html_name": "&lt;b&gt;O8&lt;/b&gt;", "source": "B", "target": "D", "status": "IN_PROGRESS"}
+    assert state["robots"][0] == {"html_name": "R1", "status": "EXECUTING", "node": "A"}
+    assert state["routes"][0]["order_html_name"] == "&lt;b&gt;O8&lt;/b&gt;"
+
+def test_dashboard_page_shows_plain_statuses():
+    from backend import main
+    import asyncio
+
+    async def render():
+        response = await main.dashboard()
+        return b"".join([chunk async for chunk in response.body_iterator]).decode()
+
+    STATE.robots["R2"].status = RobotStatus.EXECUTING
+    body = asyncio.run(render())
+    assert "<strong>R1</strong> — IDLE at <strong>A</strong>" in body
+    assert "<strong>R2</strong> — EXECUTING at <strong>C</strong>" in body
+    assert "RobotStatus." not in body
+
+def test_dashboard_state_conditional_get():
+    """Unchanged state answers 304; a tick changes the ETag"""
+    from backend.main import tick
+    import asyncio
+    import orjson
+
+    status, headers, body = asgi_get("/dashboardState")
+    assert status == 200
+    etag = headers["etag"]
+    assert orjson.loads(body)["version"] == 0
+
+    status, headers, body = asgi_get("/dashboardState", headers={"If-None-Match": etag})
+    assert status == 304
+    assert body == b""
+    assert headers["etag"] == etag
+
+    asyncio.run(tick())
+    status, headers, body = asgi_get("/dashboardState", headers={"If-None-Match": etag})
+    assert status == 200
+    assert headers["etag"] != etag
+    assert orjson.loads(body)["version"] == 1
+
+def test_dashboard_cached_per_state_version():
+    """Same version serves the cached page; a mutation forces a re-render"""
+    from backend.main import add_order
+    import asyncio
+
+    status, _, first = asgi_get("/dashboard")
+    assert status == 200
+    assert "O9" not in first.decode()
+    assert asgi_get("/dashboard")[2] == first
+
+    asyncio.run(add_order(AddOrderRequest(name="O9", source="B", target="D")))
+    assert STATE.version == 1
+    second = asgi_get("/dashboard")[2]
+    assert second != first
+    assert "<strong>O9</strong>" in second.decode()
+
 # -----------------------------
 # Reservation / Route Tests
 # -----------------------------
@@ -97,9 +239,9 @@ def test_assign_nearest_idle_robot_no_idle():
 def test_route_saved_in_state():
     order = Order(name="O4", source="B", target="D")
     route = assign_nearest_idle_robot(order)
-    assert route in STATE["routes"]
+    assert route in STATE.routes
     # The first node should be robot's starting node
-    assert route.path[0] == next(r for r in STATE["robots"] if r.name == route.robot).node or route.path[0] in GRAPH.nodes
+    assert route.path[0] == STATE.robots[route.robot].node or route.path[0] in GRAPH.nodes
 
 def test_route_progress_simulation():
     """Simulate a simple tick and check robot progresses"""
@@ -107,8 +249,8 @@ def test_route_progress_simulation():
 
     order = Order(name="O5", source="B", target="D")
     assign_nearest_idle_robot(order)
-    route = STATE["routes"][0]
-    robot = next(r for r in STATE["robots"] if r.name == route.robot)
+    route = STATE.routes[0]
+    robot = STATE.robots[route.robot]
 
     # Simulate one tick assuming edge weight 1 (simplest)
     initial_node = robot.node
@@ -118,3 +260,42 @@ def test_route_progress_simulation():
     asyncio.run(tick())
     # robot should have moved to next node
     assert robot.node != initial_node or route.remaining_weight == 0
+
+# -----------------------------
+# Audit Log Tests
+# -----------------------------
+
+def test_events_since_filter():
+    from backend.main import get_events
+    from backend.helpers import log_event
+    import asyncio
+    import time
+
+    for i in range(3):
+        log_event("test", {"i": i})
+        time.sleep(0.001)  # distinct timestamps
+    since = STATE.events[0].time
+    events = asyncio.run(get_events(since=since))
+    # strictly newer than 'since', newest first
+    assert [e.detail["i"] for e in events] == [2, 1]
+    assert len(asyncio.run(get_events(limit=1))) == 1
+
+def test_events_rejects_negative_limit():
+    assert asgi_get("/events", b"limit=-1")[0] == 422
+    assert asgi_get("/events", b"limit=0")[0] == 200
+
+def test_tick_completes_all_finished_routes():
+    """Every route finishing in the same tick is completed, none skipped"""
+    from backend.main import tick
+    import asyncio
+
+    for i, r in enumerate(STATE.robots.values()):
+        order = Order(name=f"O{i}", source=r.node, target=r.node, status=OrderStatus.IN_PROGRESS)
+        STATE.orders[order.name] = order
+        r.status = RobotStatus.EXECUTING
+        STATE.routes.append(Route(robot=r.name, next_index=0, path=[r.node], order=order.name))
+
+    asyncio.run(tick())
+    assert STATE.routes == []
+    assert all(o.status == OrderStatus.DONE for o in STATE.orders.values())
+    assert all(r.status == RobotStatus.IDLE for r in STATE.robots.values())